@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from google import genai
 from dotenv import load_dotenv
 
@@ -5,9 +7,14 @@ load_dotenv()
 
 system_prompt = "You are an AI agent that will automate scraping online marketplaces for specific products. "
 
+@lru_cache(maxsize=1)
+def _get_client() -> genai.Client:
+    # Built once on first use (after load_dotenv) and reused, so each query
+    # skips the auth/session setup and keeps HTTP connections alive
+    return genai.Client()
+
 def query_gemini(question: str) -> str:
-    client = genai.Client()
-    response = client.models.generate_content(
+    response = _get_client().models.generate_content(
         model="gemini-2.5-pro",
         contents=question,
         system_instruction=system_prompt
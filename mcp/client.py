@@ -1,70 +1,546 @@
 import asyncio
+import hashlib
+import json
+import os
+import re
 import sys
+import time
+import uuid
 from typing import Optional, List, Dict, Any
-from contextlib import AsyncExitStack
+from collections import OrderedDict
+from pathlib import Path
+import aioconsole
+import httpx
+import orjson
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+from anthropic.types import Message
 from dotenv import load_dotenv
+from memory import MemoryStore
 
 load_dotenv()
 
+# Line-buffer stdout even when piped to a log file (the default is block
+# buffering off a TTY), so connect/tool logs land promptly without a flush per print
+sys.stdout.reconfigure(line_buffering=True, write_through=False)
+
+# Static system prompt: kept byte-identical across turns so Anthropic's prompt
+# caching can reuse the prefix. Per-query context goes in user messages instead.
+SYSTEM_PROMPT = ("You are an AI agent that automates scraping online marketplaces "
+                 "for specific products, using the connected MCP tools.")
+
+def build_http_client() -> httpx.AsyncClient:
+    """Build one long-lived HTTP client for all Anthropic calls.
+
+    A fresh client per host means per-call TLS handshakes and, under fan-out,
+    pool exhaustion; sharing a bounded pool amortizes both. Limits are
+    overridable via environment variables.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "500")),
+        max_keepalive_connections=int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "100")),
+        keepalive_expiry=float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "30"))
+    )
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60))
+
+
+def _anthropic_content_serializer(obj):
+    """JSON default for anthropic content blocks (TextBlock, ToolUseBlock, ...)."""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    return str(obj)
+
+
+def _canonical_dumps(payload) -> bytes:
+    """Sorted-key JSON bytes via orjson's C encoder - cheap enough for hot cache-key paths."""
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS,
+                        default=_anthropic_content_serializer)
+
+
+class LLMCache:
+    """In-memory LRU cache for Claude responses, keyed by the full request payload."""
+
+    def __init__(self, max_entries=256, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    @staticmethod
+    def cache_key(model, messages, tools, max_tokens) -> str:
+        payload = {"model": model, "messages": messages, "tools": tools, "max_tokens": max_tokens}
+        return hashlib.sha256(_canonical_dumps(payload)).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires, value = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict, ttl=None):
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Default TTLs (seconds) for read-only tool results; 0 means never cache -
+# mutating tools like send_email must always hit the server. Servers can
+# override per tool with a "cache-ttl: N" hint in the tool description.
+TOOL_TTLS: Dict[str, int] = {
+    "get_forecast": 300,
+    "get_alerts2": 300,
+    "send_email": 0,
+}
+
+
+class ToolCache:
+    """In-memory TTL cache for read-only MCP tool results."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires, value = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RoutingPolicy:
+    """Decides whether a Claude request goes out in real time or via the Batches API.
+
+    Batched requests are billed at half the per-token price, so anything that can
+    tolerate minutes of latency (overnight scraping sweeps) should take that path.
+    """
+
+    def __init__(self, sync_max_latency_ms=5000, batch_window_ms=30000,
+                 batch_min_size=1, batch_max_size=100):
+        self.sync_max_latency_ms = sync_max_latency_ms
+        self.batch_window_ms = batch_window_ms
+        self.batch_min_size = batch_min_size
+        self.batch_max_size = batch_max_size
+
+
+class FleetDispatcher:
+    """Routes Claude requests for any number of hosts through one policy.
+
+    Interactive turns go out in real time; latency-tolerant ones from every
+    host are pooled into shared Batches API submissions, so the batch window
+    amortizes across a whole fleet of scraper agents instead of per host.
+    """
+
+    def __init__(self, anthropic: AsyncAnthropic, policy: Optional[RoutingPolicy] = None):
+        self.anthropic = anthropic
+        self.policy = policy or RoutingPolicy()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def submit(self, *, latency_budget_ms=0, **params) -> Message:
+        """Send one request, batched or real-time depending on its latency budget."""
+        if latency_budget_ms <= self.policy.sync_max_latency_ms:
+            return await self.anthropic.messages.create(**params)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((str(uuid.uuid4()), params, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        """Drain the queue: collect a window of requests, submit, repeat."""
+        policy = self.policy
+        window = policy.batch_window_ms / 1000
+        while True:
+            try:
+                pending = [await asyncio.wait_for(self._queue.get(), window)]
+            except asyncio.TimeoutError:
+                return
+            deadline = time.monotonic() + window
+            while len(pending) < policy.batch_max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and len(pending) >= policy.batch_min_size:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(
+                        self._queue.get(), max(remaining, 0.01)))
+                except asyncio.TimeoutError:
+                    break
+            await self._run_batch(pending)
+
+    async def _run_batch(self, pending):
+        """Submit one batch, poll until it ends, and resolve the waiting futures."""
+        futures = {custom_id: future for custom_id, _, future in pending}
+        try:
+            batch = await self.anthropic.messages.batches.create(
+                requests=[{"custom_id": custom_id, "params": params}
+                          for custom_id, params, _ in pending]
+            )
+            while batch.processing_status != "ended":
+                await asyncio.sleep(5)
+                batch = await self.anthropic.messages.batches.retrieve(batch.id)
+            async for entry in await self.anthropic.messages.batches.results(batch.id):
+                future = futures.pop(entry.custom_id, None)
+                if future is None or future.done():
+                    continue
+                if entry.result.type == "succeeded":
+                    future.set_result(entry.result.message)
+                else:
+                    future.set_exception(
+                        RuntimeError(f"batch request failed: {entry.result.type}"))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(RuntimeError("batch ended without a result"))
+
+
 class MCPHost:
     """MCP Host managing multiple client sessions."""
-    
-    def __init__(self):
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None,
+                 dispatcher: Optional[FleetDispatcher] = None):
         self.sessions: Dict[str, ClientSession] = {}
+        self.session_semaphores: Dict[ClientSession, asyncio.Semaphore] = {}
         self.tool_to_session_map: Dict[str, ClientSession] = {}
         self.tools: List[Dict[str, Any]] = []
-        self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        # One (worker task, stop event) per server connection; the worker owns
+        # the connection's context managers end-to-end (see _connection_worker)
+        self._connections: List[tuple[asyncio.Task, asyncio.Event]] = []
+        self._http_client = http_client
+        self.anthropic = AsyncAnthropic(http_client=http_client)
+        self.llm_cache = LLMCache()
+        self.tool_cache = ToolCache()
+        self.tool_ttls = dict(TOOL_TTLS)
+        # Single-flight maps: a duplicate request issued while an identical one
+        # is still in the air awaits the first one's future instead of paying again
+        self._llm_inflight: Dict[str, asyncio.Future] = {}
+        self._tool_inflight: Dict[str, asyncio.Future] = {}
+        self.dispatcher = dispatcher or FleetDispatcher(self.anthropic)
+        self.session_id = str(uuid.uuid4())
+        self.memory = MemoryStore()
         self.conversation_history = []
 
     async def connect_to_server(self, server_cmd: str):
         """Connect to a server and add its tools to the host."""
         if not server_cmd:
             raise ValueError("empty server command")
-        server_params = StdioServerParameters(command=server_cmd[0], args=server_cmd[1:], env=None)
 
-        # Each server gets its own transport and session
-        transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        stdio, write = transport
-        session = await self.exit_stack.enter_async_context(ClientSession(stdio, write))
-        
-        try:
-            await session.initialize()
-        except Exception as e:
-            raise RuntimeError(f"failed to initialize server: {' '.join(server_cmd)}") from e
-        
-        # Store session
+        # A dedicated worker task owns the transport and session contexts: the
+        # anyio cancel scopes inside stdio_client/ClientSession are task-bound,
+        # so entering them here under gather and exiting them from cleanup()
+        # in the main task would raise at shutdown
+        ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        worker = asyncio.create_task(self._connection_worker(server_cmd, ready, stop))
+        self._connections.append((worker, stop))
+        session = await ready
+
+        # Store session, with a cap on concurrent in-flight calls so gather
+        # fan-out can't hammer one slow subprocess
         self.sessions[" ".join(server_cmd)] = session
+        self.session_semaphores[session] = asyncio.Semaphore(
+            int(os.getenv("MCP_MAX_INFLIGHT", "8")))
         
-        # Get tools for this server
-        resp = await session.list_tools()
-        for t in resp.tools:
-            tool = {"name": t.name, "description": t.description, "input_schema": t.inputSchema}
+        # Get tools for this server, reusing the on-disk copy when the server
+        # script and argv are unchanged (skips a JSON-RPC roundtrip at startup)
+        cache_path = self._tools_cache_path(server_cmd)
+        if cache_path is not None and cache_path.exists():
+            server_tools = json.loads(cache_path.read_text())
+        else:
+            resp = await session.list_tools()
+            server_tools = [{"name": t.name, "description": t.description,
+                             "input_schema": t.inputSchema} for t in resp.tools]
+            if cache_path is not None:
+                cache_path.write_text(json.dumps(server_tools))
+
+        for tool in server_tools:
             self.tools.append(tool)
-            self.tool_to_session_map[t.name] = session
-        print(f"connected: {' '.join(server_cmd)} -> {[t.name for t in resp.tools]}")
-    
+            self.tool_to_session_map[tool["name"]] = session
+            ttl_hint = re.search(r"cache[-_]ttl\s*[:=]\s*(\d+)", tool["description"] or "")
+            if ttl_hint:
+                self.tool_ttls[tool["name"]] = int(ttl_hint.group(1))
+        # Deterministic tool order regardless of connect order, so the prompt
+        # prefix stays identical across turns and sessions
+        self.tools.sort(key=lambda t: t["name"])
+        # One write per server instead of a print per tool
+        sys.stdout.write(f"connected: {' '.join(server_cmd)}\n"
+                         + "".join(f"---name: {t['name']}\n" for t in server_tools))
+
+    async def _connection_worker(self, server_cmd, ready: asyncio.Future,
+                                 stop: asyncio.Event):
+        """Hold one server connection open, entering and exiting its contexts here.
+
+        Resolves ready with the initialized session (or the connect error),
+        then parks until cleanup() sets stop, so the cancel scopes unwind in
+        the same task that entered them.
+        """
+        server_params = StdioServerParameters(
+            command=server_cmd[0], args=server_cmd[1:], env=None)
+        try:
+            async with stdio_client(server_params) as (stdio, write):
+                async with ClientSession(stdio, write) as session:
+                    try:
+                        await session.initialize()
+                    except Exception as e:
+                        raise RuntimeError(
+                            f"failed to initialize server: {' '.join(server_cmd)}") from e
+                    ready.set_result(session)
+                    await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                raise
+
+    @staticmethod
+    def _tools_cache_path(server_cmd) -> Optional[Path]:
+        """Cache file for a server's tool list, fingerprinted on its argv and script bytes.
+
+        Editing the server script (or changing its arguments) changes the
+        fingerprint, so stale tool lists invalidate themselves.
+        """
+        fingerprint = hashlib.sha256(repr(server_cmd).encode())
+        for part in server_cmd[1:]:
+            if os.path.isfile(part):
+                fingerprint.update(Path(part).read_bytes())
+        cache_dir = Path.home() / ".cache" / "mcp" / "tools"
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+        return cache_dir / f"{fingerprint.hexdigest()}.json"
+
     def truncate_history(self, max_messages=50):
             """Keep conversation history under max_messages to prevent context overflow"""
             if len(self.conversation_history) > max_messages:
                 self.conversation_history = self.conversation_history[-max_messages:]
-            
-    async def process_query(self, query: str) -> str:
-        """Process query with Claude using atomic message blocks - complete assistant responses followed by complete tool results"""
+
+    async def _maybe_summarize(self, token_budget=8000, keep_last=10):
+        """Replace the oldest turns with a compact summary once history grows past token_budget.
+
+        Keeps the last keep_last messages verbatim so recent tool exchanges stay
+        intact, and only splits at a plain user query so no tool_use block is
+        separated from its tool_result. Without this, every turn re-sends the
+        full log and token cost grows quadratically over a session.
+        """
+        estimated_tokens = len(_canonical_dumps(self.conversation_history)) // 4
+        if estimated_tokens <= token_budget or len(self.conversation_history) <= keep_last:
+            return
+
+        split = len(self.conversation_history) - keep_last
+        while split > 0:
+            msg = self.conversation_history[split]
+            if msg["role"] == "user" and isinstance(msg["content"], str):
+                break
+            split -= 1
+        if split <= 0:
+            return
+
+        transcript = _canonical_dumps(self.conversation_history[:split]).decode()
+        summary_response = await self.anthropic.messages.create(
+            model="claude-3-5-haiku-latest",
+            max_tokens=500,
+            messages=[{
+                "role": "user",
+                "content": "Summarize this agent conversation transcript in a few sentences, "
+                           "keeping any facts, product listings, or decisions needed to "
+                           f"continue the task:\n{transcript}"
+            }]
+        )
+        summary = "".join(c.text for c in summary_response.content if c.type == "text")
+        self.conversation_history = (
+            [{"role": "user", "content": f"Prior context summary: {summary}"}]
+            + self.conversation_history[split:]
+        )
+
+    async def _create_message(self, *, model, max_tokens, messages, tools,
+                              latency_budget_ms=0, on_tool_block=None) -> Message:
+        """Call Claude, serving repeated identical requests from the LLM cache.
+
+        Identical requests issued while one is still in flight coalesce onto
+        that call instead of duplicating it. Requests whose latency budget exceeds the routing policy's sync
+        threshold go through the half-price Batches API instead of a real-time
+        call. Only deterministic requests (no temperature set) go through here,
+        so a cache hit is always a valid substitute for the API call.
+
+        When on_tool_block is given, the real-time path streams the response
+        and invokes it with each completed tool_use block, so tool execution
+        can start while Claude is still generating.
+        """
+        key = LLMCache.cache_key(model, messages, tools, max_tokens)
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            return Message.model_validate(cached)
+
+        # Single-flight: piggyback on an identical request already in the air
+        inflight = self._llm_inflight.get(key)
+        if inflight is not None:
+            return await inflight
+        future = asyncio.get_running_loop().create_future()
+        self._llm_inflight[key] = future
+        try:
+            response = await self._call_claude(
+                key, model, max_tokens, messages, tools,
+                latency_budget_ms, on_tool_block)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # silence 'never retrieved' if nobody was waiting
+            raise
+        finally:
+            self._llm_inflight.pop(key, None)
+
+    async def _call_claude(self, key, model, max_tokens, messages, tools,
+                           latency_budget_ms, on_tool_block) -> Message:
+        # Static system block plus a cache_control marker on the last tool keep
+        # the whole prefix (system + tools) eligible for Anthropic prompt caching
+        system_blocks = [{"type": "text", "text": SYSTEM_PROMPT,
+                          "cache_control": {"type": "ephemeral"}}]
+        if tools:
+            tools = list(tools)
+            tools[-1] = {**tools[-1], "cache_control": {"type": "ephemeral"}}
+        params = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "system": system_blocks,
+            "messages": messages,
+            "tools": tools
+        }
+        if (on_tool_block is not None
+                and latency_budget_ms <= self.dispatcher.policy.sync_max_latency_ms):
+            async with self.anthropic.messages.stream(**params) as stream:
+                async for event in stream:
+                    if (event.type == "content_block_stop"
+                            and event.content_block.type == "tool_use"):
+                        on_tool_block(event.content_block)
+                response = await stream.get_final_message()
+        else:
+            response = await self.dispatcher.submit(
+                latency_budget_ms=latency_budget_ms, **params)
+        await self.llm_cache.set(key, response.model_dump(), ttl=3600)
+        return response
+
+    async def _exec_one(self, tool_call) -> str:
+        """Execute a single tool call and return its result text.
+
+        Read-only tools (nonzero TTL in tool_ttls) are served from tool_cache
+        when the same tool+input was called recently, and duplicate in-flight
+        invocations coalesce onto one call. Mutating tools (TTL 0) always run.
+        """
+        try:
+            target_session = self.tool_to_session_map[tool_call.name]
+        except KeyError:
+            return f"Error: Tool '{tool_call.name}' not found."
+
+        ttl = self.tool_ttls.get(tool_call.name, 0)
+        key = f"{tool_call.name}:{_canonical_dumps(tool_call.input).decode()}"
+        future = None
+        if ttl > 0:
+            cached = await self.tool_cache.get(key)
+            if cached is not None:
+                return cached
+            inflight = self._tool_inflight.get(key)
+            if inflight is not None:
+                return await inflight
+            future = asyncio.get_running_loop().create_future()
+            self._tool_inflight[key] = future
+
+        try:
+            async with self.session_semaphores[target_session]:
+                result = await target_session.call_tool(tool_call.name, tool_call.input)
+            if result.content:
+                result_text = '\n'.join(
+                    getattr(content, 'text', str(content)) for content in result.content)
+            else:
+                result_text = "no result"
+            if ttl > 0:
+                await self.tool_cache.set(key, result_text, ttl)
+            if future is not None:
+                future.set_result(result_text)
+            return result_text
+        except BaseException as e:
+            if future is not None:
+                future.set_exception(e)
+                future.exception()  # silence 'never retrieved' if nobody was waiting
+            raise
+        finally:
+            if future is not None:
+                self._tool_inflight.pop(key, None)
+
+    async def process_query(self, query: str, latency_budget_ms: int = 0) -> str:
+        """Process query with Claude using atomic message blocks - complete assistant responses followed by complete tool results
+
+        A loose latency_budget_ms (e.g. for scripted scraping sweeps) routes the
+        Claude calls through the Batches API at half the token price.
+        """
         self.truncate_history()
-        self.conversation_history.append({"role": "user", "content": query})
+
+        # Pull only the top-K relevant turns from prior sessions rather than
+        # replaying any full log; retrieved memory rides along in the user
+        # message, keeping the cached system+tools prefix untouched
+        retrieved = self.memory.retrieve(query, k=5, exclude_session=self.session_id)
+        if retrieved:
+            self.conversation_history.append({
+                "role": "user",
+                "content": [
+                    {"type": "text",
+                     "text": "Relevant context from earlier sessions:\n" + "\n---\n".join(retrieved)},
+                    {"type": "text", "text": query}
+                ]
+            })
+        else:
+            self.conversation_history.append({"role": "user", "content": query})
+        self.memory.add(self.session_id, "user", query)
         log_parts = []
 
         while True:
-            claude_response = self.anthropic.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=1000,
-                messages=self.conversation_history,
-                tools=self.tools
-            )
+            await self._maybe_summarize()
+
+            # Kick off tool calls as soon as their blocks finish streaming,
+            # overlapping execution with the rest of Claude's generation
+            predispatched: Dict[str, asyncio.Task] = {}
+
+            def _early_dispatch(block):
+                predispatched[block.id] = asyncio.create_task(self._exec_one(block))
+
+            try:
+                claude_response = await self._create_message(
+                    model="claude-sonnet-4-20250514",
+                    max_tokens=1000,
+                    messages=self.conversation_history,
+                    tools=self.tools,
+                    latency_budget_ms=latency_budget_ms,
+                    on_tool_block=_early_dispatch
+                )
+            except BaseException:
+                # A failed turn must not leave early-dispatched tools running
+                # (or their exceptions unretrieved); cancel and reap them
+                for task in predispatched.values():
+                    task.cancel()
+                if predispatched:
+                    await asyncio.gather(*predispatched.values(), return_exceptions=True)
+                raise
 
             # Parse model response
             assistant_content = []
@@ -83,24 +559,23 @@ class MCPHost:
             if not tool_calls_to_execute:
                 break
 
-            # Execute tool calls 
-            tool_results = []
+            # Execute tool calls concurrently - independent calls overlap their I/O
             for tool_call in tool_calls_to_execute:
                 log_parts.append(f"CALLING TOOL: {tool_call.name} WITH {tool_call.input}")
-                
-                target_session = self.tool_to_session_map.get(tool_call.name)
 
-                if not target_session:
-                    result_text = f"Error: Tool '{tool_call.name}' not found."
-                else:
-                    result = await target_session.call_tool(tool_call.name, tool_call.input)
-                    result_content = []
-                    if result.content:
-                        for content in result.content:
-                            result_content.append(getattr(content, 'text', str(content)))
-                    result_text = '\n'.join(result_content) if result_content else "no result"
-                
-                tool_results.append({
+            results = await asyncio.gather(
+                *(predispatched.pop(tool_call.id, None) or self._exec_one(tool_call)
+                  for tool_call in tool_calls_to_execute),
+                return_exceptions=True
+            )
+
+            # Build tool_results in the original tool_use order
+            tool_results = []
+            append_result = tool_results.append
+            for tool_call, result_text in zip(tool_calls_to_execute, results):
+                if isinstance(result_text, BaseException):
+                    result_text = f"Error: tool '{tool_call.name}' failed: {result_text}"
+                append_result({
                     "type": "tool_result",
                     "tool_use_id": tool_call.id,
                     "content": result_text
@@ -108,41 +583,70 @@ class MCPHost:
 
             # Log all tool call results as one user message
             self.conversation_history.append({"role": "user", "content": tool_results})
-        
-        return '\n'.join(log_parts)
+
+        response_text = '\n'.join(log_parts)
+        self.memory.add(self.session_id, "assistant", response_text)
+        return response_text
 
     async def chat_loop(self):
-        print("\nMCP Host started with all connected servers.")
-        print("Type queries or 'quit' to exit.")
-        
+        await aioconsole.aprint("\nMCP Host started with all connected servers.")
+        await aioconsole.aprint("Type queries or 'quit' to exit.")
+
         while True:
             try:
-                query = input("\nquery: ").strip()
+                # ainput reads stdin off the event loop, so MCP session stdio
+                # and background batch flushes keep progressing while we wait
+                query = (await aioconsole.ainput("\nquery: ")).strip()
                 if query.lower() == 'quit':
                     break
-                
+
                 response = await self.process_query(query)
-                print(f"\n{response}")
-                
+                await aioconsole.aprint(f"\n{response}")
+
+            except (EOFError, KeyboardInterrupt):
+                break
             except Exception as e:
-                print(f"error: {str(e)}")
+                await aioconsole.aprint(f"error: {str(e)}")
 
     async def cleanup(self):
-        await self.exit_stack.aclose()
+        # Signal every connection worker to unwind its own contexts, then wait;
+        # a failed teardown of one server must not block the others
+        for _, stop in self._connections:
+            stop.set()
+        for worker, _ in self._connections:
+            try:
+                await worker
+            except (Exception, asyncio.CancelledError):
+                pass
+        self.memory.close()
+        if self._http_client is not None:
+            await self._http_client.aclose()
 
 async def main():
     servers = [[sys.executable, "C:/Users/mgnli/agentic-marketplace-scraper/mcp/weather.py"], 
     [sys.executable, "C:/Users/mgnli/agentic-marketplace-scraper/mcp/weather2.py"], 
     ["uv", "--directory","C:/Users/mgnli/gmail-mcp-server", "run", "gmail", "--creds-file-path", "C:/Users/mgnli/gmail-mcp-server/gmail_creds.json", "--token-path", "C:/Users/mgnli/gmail-mcp-server/gmail_tokens.json"]]
 
-    client_host = MCPHost()
+    # One HTTP client and one dispatcher; every host added to the fleet shares
+    # the connection pool and the batch window
+    http_client = build_http_client()
+    fleet = FleetDispatcher(AsyncAnthropic(http_client=http_client))
+    client_host = MCPHost(http_client=http_client, dispatcher=fleet)
     try:
-        for server_params in servers:
-            await client_host.connect_to_server(server_params)
-        
+        # Connect to all servers concurrently - each connect is dominated by
+        # subprocess spawn + the initialize/list_tools handshake
+        await asyncio.gather(*(client_host.connect_to_server(s) for s in servers))
+
+
         await client_host.chat_loop()
     finally:
         await client_host.cleanup()
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        # uvloop is unix-only; Windows dev machines fall back to the default loop
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,88 @@
+import heapq
+import json
+import math
+import re
+import sqlite3
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+# Dimension of the hashed bag-of-words embedding. Small enough that scoring a
+# few thousand stored turns in Python is sub-millisecond, large enough that
+# token collisions are rare.
+EMBEDDING_DIMS = 256
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str) -> List[float]:
+    """Embed text as an L2-normalized hashed bag-of-words vector.
+
+    A deterministic, dependency-free stand-in for a learned sentence encoder:
+    good enough to surface prior turns that share vocabulary with the query.
+    """
+    vec = [0.0] * EMBEDDING_DIMS
+    for word in _WORD_RE.findall(text.lower()):
+        # crc32 rather than hash(): str hashing is salted per process, and
+        # embeddings must stay comparable across restarts
+        vec[zlib.crc32(word.encode()) % EMBEDDING_DIMS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm > 0:
+        vec = [v / norm for v in vec]
+    return vec
+
+
+def _pack(vec: List[float]) -> bytes:
+    return struct.pack(f"{len(vec)}f", *vec)
+
+
+def _unpack(blob: bytes) -> List[float]:
+    return list(struct.unpack(f"{len(blob) // 4}f", blob))
+
+
+class MemoryStore:
+    """SQLite-backed conversation memory with vector retrieval.
+
+    Every turn is persisted with an embedding, so memory survives chat_loop
+    restarts and each new query only pulls in the top-K relevant prior turns
+    instead of replaying the full log.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            db_path = str(Path.home() / ".cache" / "mcp" / "memory.db")
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "ts REAL, session_id TEXT, role TEXT, content_json TEXT, embedding BLOB)"
+        )
+        self._conn.commit()
+
+    def add(self, session_id: str, role: str, content: str):
+        """Persist one turn with its embedding."""
+        self._conn.execute(
+            "INSERT INTO turns VALUES (?, ?, ?, ?, ?)",
+            (time.time(), session_id, role, json.dumps(content), _pack(embed(content)))
+        )
+        self._conn.commit()
+
+    def retrieve(self, query: str, k: int = 5, exclude_session: Optional[str] = None) -> List[str]:
+        """Return the k stored turns most similar to the query, best first."""
+        query_vec = embed(query)
+        rows = self._conn.execute(
+            "SELECT content_json, embedding FROM turns WHERE session_id != ?",
+            (exclude_session or "",)
+        ).fetchall()
+        scored = []
+        for content_json, blob in rows:
+            score = sum(a * b for a, b in zip(query_vec, _unpack(blob)))
+            if score > 0:
+                scored.append((score, content_json))
+        return [json.loads(content_json)
+                for _, content_json in heapq.nlargest(k, scored, key=lambda s: s[0])]
+
+    def close(self):
+        self._conn.close()